@@ -15,10 +15,23 @@ class DoctorClinicAvailabilityInline(admin.TabularInline):
     extra = 1
     fields = ["clinic", "day_of_week", "start_time", "end_time"]
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "clinic":
+            kwargs["queryset"] = Clinic.objects.all()
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "clinic":
+            # Evaluate the clinic choices once and share them across every
+            # inline row instead of re-querying for each row's dropdown
+            if not hasattr(request, "_clinic_choices"):
+                request._clinic_choices = list(formfield.choices)
+            formfield.choices = request._clinic_choices
+        return formfield
+
 
 @admin.register(Doctor)
 class DoctorAdmin(admin.ModelAdmin):
     list_display = ["user", "specialization", "license_number", "get_clinics"]
+    list_select_related = ("user",)
     search_fields = [
         "user__first_name",
         "user__last_name",
@@ -27,6 +40,10 @@ class DoctorAdmin(admin.ModelAdmin):
     ]
     inlines = [DoctorClinicAvailabilityInline]  # Add inline for availability
 
+    def get_queryset(self, request):
+        # Load every row's clinics in one query for the get_clinics column
+        return super().get_queryset(request).prefetch_related("clinics")
+
     def get_clinics(self, obj):
         return ", ".join([clinic.name for clinic in obj.clinics.all()])
 
@@ -49,6 +66,7 @@ class ClinicAdmin(admin.ModelAdmin):
 @admin.register(VisitType)
 class VisitTypeAdmin(admin.ModelAdmin):
     list_display = ["name", "duration_minutes", "clinic"]
+    list_select_related = ("clinic",)
     list_filter = ["clinic"]
     search_fields = ["name"]
 
@@ -56,12 +74,14 @@ class VisitTypeAdmin(admin.ModelAdmin):
 @admin.register(Patient)
 class PatientAdmin(admin.ModelAdmin):
     list_display = ["user", "date_of_birth", "phone", "emergency_contact"]
+    list_select_related = ("user",)
     search_fields = ["user__first_name", "user__last_name", "phone"]
 
 
 @admin.register(DoctorClinicAvailability)
 class DoctorClinicAvailabilityAdmin(admin.ModelAdmin):
     list_display = ["doctor", "clinic", "day_of_week", "start_time", "end_time"]
+    list_select_related = ("doctor", "clinic")
     list_filter = ["clinic", "day_of_week", "doctor"]
     search_fields = [
         "doctor__user__first_name",
@@ -80,6 +100,7 @@ class AppointmentAdmin(admin.ModelAdmin):
         "status",
         "visit_type",
     ]
+    list_select_related = ("patient", "doctor", "clinic", "visit_type")
     list_filter = ["status", "clinic", "scheduled_time", "doctor"]
     search_fields = [
         "patient__user__first_name",
@@ -1,4 +1,28 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication
+from .caching import cache_token, get_cached_token, token_cache_version
 
 class BearerTokenAuthentication(TokenAuthentication):
-    keyword = 'Bearer'
\ No newline at end of file
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        # Read the version first, so a revoke during the lookup orphans the
+        # entry written below
+        version = token_cache_version(key)
+        token = get_cached_token(key, version)
+        if token is None:
+            # Join the patient/doctor profiles so role checks don't query again
+            model = self.get_model()
+            try:
+                token = model.objects.select_related(
+                    'user', 'user__patient', 'user__doctor'
+                ).get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cache_token(token, version)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
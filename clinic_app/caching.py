@@ -0,0 +1,138 @@
+from uuid import uuid4
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authtoken.models import Token
+
+# Upper bound on staleness for changes that do not invalidate, such as a
+# visit type's duration being edited
+SLOTS_CACHE_TIMEOUT = 60
+
+
+def _slots_version_key(doctor_id):
+    return f"slots-version:{doctor_id}"
+
+
+def slots_cache_key(doctor_id, clinic_id, visit_type_id, date):
+    """Cache key for one available-slots response"""
+    version = cache.get(_slots_version_key(doctor_id), 0)
+    return f"slots:{doctor_id}:{version}:{clinic_id}:{visit_type_id}:{date.isoformat()}"
+
+
+def invalidate_doctor_slots(doctor_id):
+    """Orphan every cached available-slots response for a doctor"""
+    try:
+        cache.incr(_slots_version_key(doctor_id))
+    except ValueError:
+        cache.set(_slots_version_key(doctor_id), 1, None)
+
+
+# Authenticated tokens are cached as plain field values of the token, its user
+# (minus the password hash) and their profiles. Entries sit under a per-key
+# version read before the database lookup, so revoking by bumping the version
+# also orphans an entry written late by a request that read the row just
+# before the revoke. A per-process cache would only drop it in one worker, so
+# this is off unless CACHE_AUTH_TOKENS is set.
+TOKEN_CACHE_TIMEOUT = 300
+_PROFILES = ("patient", "doctor")
+
+
+def _token_version_key(key):
+    return f"auth-token-version:{key}"
+
+
+def _token_key(key, version):
+    return f"auth-token:{key}:{version}"
+
+
+def _row(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def _from_row(model, row):
+    return model.from_db(DEFAULT_DB_ALIAS, list(row), list(row.values()))
+
+
+def token_cache_version(key):
+    """Current cache version of a token key, or None when caching is off"""
+    if not getattr(settings, "CACHE_AUTH_TOKENS", False):
+        return None
+    return cache.get(_token_version_key(key), 0)
+
+
+def get_cached_token(key, version):
+    """Rebuild the cached Token for a key, with its user and profiles, or None"""
+    if version is None:
+        return None
+    entry = cache.get(_token_key(key, version))
+    if entry is None:
+        return None
+
+    token = _from_row(Token, entry["token"])
+    # The password hash is never cached; it loads on demand if checked
+    user = _from_row(User, entry["user"])
+    token._state.fields_cache["user"] = user
+    user._state.fields_cache["auth_token"] = token
+    for name in _PROFILES:
+        profile = None
+        if entry[name] is not None:
+            profile = _from_row(User._meta.get_field(name).related_model, entry[name])
+            profile._state.fields_cache["user"] = user
+        user._state.fields_cache[name] = profile
+    return token
+
+
+def cache_token(token, version):
+    """Cache a Token loaded with its user and profiles under a version"""
+    if version is None:
+        return
+    user = token.user
+    entry = {
+        "token": _row(token),
+        "user": _row(user, exclude={"password"}),
+    }
+    for name in _PROFILES:
+        entry[name] = _row(getattr(user, name)) if hasattr(user, name) else None
+    cache.set(_token_key(token.key, version), entry, TOKEN_CACHE_TIMEOUT)
+
+
+def forget_token(key):
+    """Orphan the cached entry for a token key, including any written late"""
+    if not getattr(settings, "CACHE_AUTH_TOKENS", False):
+        return
+    # A fresh value rather than incr(), so a version that expired and was
+    # set again can never match an entry still cached under it; the version
+    # outlives any entry written before the bump
+    cache.set(_token_version_key(key), uuid4().hex, 2 * TOKEN_CACHE_TIMEOUT)
+
+
+def forget_user_token(user_id):
+    """Orphan the cached entry for a user's token, if they have one"""
+    if not getattr(settings, "CACHE_AUTH_TOKENS", False):
+        return
+    for key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+        forget_token(key)
+
+
+# The public clinic list rarely changes; any clinic save or delete drops it
+CLINIC_LIST_CACHE_TIMEOUT = 300
+_CLINIC_LIST_VERSION_KEY = "clinic-list-version"
+
+
+def clinic_list_cache_key(page_number):
+    """Cache key for one page of the clinic list"""
+    version = cache.get(_CLINIC_LIST_VERSION_KEY, 0)
+    return f"clinic-list:{version}:{page_number}"
+
+
+def invalidate_clinic_list():
+    """Orphan every cached page of the clinic list"""
+    try:
+        cache.incr(_CLINIC_LIST_VERSION_KEY)
+    except ValueError:
+        cache.set(_CLINIC_LIST_VERSION_KEY, 1, None)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-15 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic_app', '0002_alter_appointment_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'status', 'scheduled_time', 'end_time'], name='appt_overlap_idx'),
+        ),
+    ]
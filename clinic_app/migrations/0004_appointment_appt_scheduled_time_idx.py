@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-15 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinic_app", "0003_appointment_appt_overlap_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["scheduled_time"], name="appt_scheduled_time_idx"
+            ),
+        ),
+    ]
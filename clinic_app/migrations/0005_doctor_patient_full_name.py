@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-15 09:11
+
+from django.db import migrations, models
+
+
+def populate_full_name(apps, schema_editor):
+    # Historical models lack User.get_full_name(), so mirror it here
+    for model_name in ("Doctor", "Patient"):
+        model = apps.get_model("clinic_app", model_name)
+        for profile in model.objects.select_related("user"):
+            profile.full_name = (
+                f"{profile.user.first_name} {profile.user.last_name}".strip()
+            )
+            profile.save(update_fields=["full_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinic_app", "0004_appointment_appt_scheduled_time_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="doctor",
+            name="full_name",
+            field=models.CharField(blank=True, editable=False, max_length=301),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="full_name",
+            field=models.CharField(blank=True, editable=False, max_length=301),
+        ),
+        migrations.RunPython(populate_full_name, migrations.RunPython.noop),
+    ]
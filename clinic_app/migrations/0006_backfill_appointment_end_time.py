@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import F
+
+
+def populate_end_time(apps, schema_editor):
+    # One UPDATE per visit type length instead of a save() per row; SQLite
+    # can't multiply an interval, so the duration stays a Python constant
+    Appointment = apps.get_model("clinic_app", "Appointment")
+    missing = Appointment.objects.filter(end_time__isnull=True)
+    durations = (
+        missing.values_list("visit_type__duration_minutes", flat=True)
+        .order_by()
+        .distinct()
+    )
+    for minutes in list(durations):
+        missing.filter(visit_type__duration_minutes=minutes).update(
+            end_time=F("scheduled_time") + timedelta(minutes=minutes)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinic_app", "0005_doctor_patient_full_name"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_end_time, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-15 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinic_app", "0006_backfill_appointment_end_time"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="appointment",
+            name="appt_overlap_idx",
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                condition=models.Q(("status", "scheduled")),
+                fields=["doctor", "scheduled_time", "end_time"],
+                name="appt_doc_time_sched_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinic_app", "0007_appointment_appt_doc_time_sched_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="appointment",
+            name="end_time",
+            field=models.DateTimeField(blank=True),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from .caching import invalidate_doctor_slots
 
 
 class Clinic(models.Model):
@@ -33,9 +37,16 @@ class Doctor(models.Model):
     specialization = models.CharField(max_length=100)
     license_number = models.CharField(max_length=50, unique=True)
     clinics = models.ManyToManyField(Clinic, through="DoctorClinicAvailability")
+    # Copy of user.get_full_name() so listings can render names without
+    # joining auth_user; kept in sync by save() and signals.sync_full_name
+    full_name = models.CharField(max_length=301, blank=True, editable=False)
 
     def __str__(self):
-        return f"Dr. {self.user.get_full_name()}"
+        return f"Dr. {self.full_name}"
+
+    def save(self, *args, **kwargs):
+        self.full_name = self.user.get_full_name()
+        super().save(*args, **kwargs)
 
 
 class Patient(models.Model):
@@ -43,9 +54,15 @@ class Patient(models.Model):
     date_of_birth = models.DateField()
     phone = models.CharField(max_length=20)
     emergency_contact = models.CharField(max_length=100, blank=True)
+    # Copy of user.get_full_name(), see Doctor.full_name
+    full_name = models.CharField(max_length=301, blank=True, editable=False)
 
     def __str__(self):
-        return self.user.get_full_name()
+        return self.full_name
+
+    def save(self, *args, **kwargs):
+        self.full_name = self.user.get_full_name()
+        super().save(*args, **kwargs)
 
 
 class DoctorClinicAvailability(models.Model):
@@ -70,7 +87,86 @@ class DoctorClinicAvailability(models.Model):
         verbose_name_plural = "Doctor clinic availabilities"
 
     def __str__(self):
-        return f"{self.doctor} at {self.clinic} on {self.get_day_of_week_display()}"
+        return f"{self.doctor} at {self.clinic} on {_DAY_NAMES[self.day_of_week]}"
+
+    @property
+    def start_minute(self):
+        """start_time as minutes since midnight"""
+        return self.start_time.hour * 60 + self.start_time.minute
+
+    @property
+    def end_minute(self):
+        """end_time as minutes since midnight"""
+        return self.end_time.hour * 60 + self.end_time.minute
+
+
+# Plain dict lookup for __str__, which admin calls for every row
+_DAY_NAMES = dict(DoctorClinicAvailability.DAYS_OF_WEEK)
+
+
+class AppointmentManager(models.Manager):
+    def bulk_create_validated(self, rows):
+        """Create appointments from a list of field dicts in one INSERT.
+
+        Overlaps are checked with a single query for all doctors involved
+        instead of a full_clean() per row. If any scheduled row overlaps an
+        existing appointment or another row, nothing is created.
+        """
+        appointments = [self.model(**row) for row in rows]
+        for appointment in appointments:
+            appointment.calculate_end_time()
+
+        scheduled = [a for a in appointments if a.status == "scheduled"]
+        with transaction.atomic():
+            if scheduled:
+                self._check_batch_overlaps(scheduled)
+            created = self.bulk_create(appointments)
+
+            # bulk_create() sends no post_save, so invalidate cached slots here
+            for doctor_id in {a.doctor_id for a in appointments}:
+                transaction.on_commit(partial(invalidate_doctor_slots, doctor_id))
+            return created
+
+    def _check_batch_overlaps(self, appointments):
+        doctor_ids = {a.doctor_id for a in appointments}
+        list(Doctor.objects.select_for_update().filter(pk__in=doctor_ids))
+
+        # Existing intervals are tagged None, pending ones with their row
+        intervals = defaultdict(list)
+        existing = self.filter(
+            doctor_id__in=doctor_ids,
+            status="scheduled",
+            scheduled_time__lt=max(a.end_time for a in appointments),
+            end_time__gt=min(a.scheduled_time for a in appointments),
+        ).values_list("doctor_id", "scheduled_time", "end_time")
+        for doctor_id, start, end in existing:
+            intervals[doctor_id].append((start, end, None))
+        for appointment in appointments:
+            intervals[appointment.doctor_id].append(
+                (appointment.scheduled_time, appointment.end_time, appointment)
+            )
+
+        # Sweep each doctor's intervals by start time, comparing every
+        # interval with the one that reaches furthest so far
+        conflicts = []
+        for doctor_intervals in intervals.values():
+            doctor_intervals.sort(key=lambda interval: interval[0])
+            furthest = None
+            for interval in doctor_intervals:
+                if furthest and interval[0] < furthest[1]:
+                    if interval[2] is not None or furthest[2] is not None:
+                        conflicts.append(interval[2] or furthest[2])
+                if furthest is None or interval[1] > furthest[1]:
+                    furthest = interval
+
+        if conflicts:
+            raise ValidationError(
+                [
+                    f"Appointment for {a.doctor} at {a.scheduled_time} overlaps "
+                    f"with another appointment."
+                    for a in conflicts
+                ]
+            )
 
 
 class Appointment(models.Model):
@@ -86,35 +182,74 @@ class Appointment(models.Model):
     clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE)
     visit_type = models.ForeignKey(VisitType, on_delete=models.CASCADE)
     scheduled_time = models.DateTimeField()
-    end_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(blank=True)
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default="scheduled"
     )
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AppointmentManager()
+
     class Meta:
         ordering = ["scheduled_time"]
+        indexes = [
+            # Serves the overlap lookups in clean() and available_slots: only
+            # scheduled appointments block time, so the others stay out of it
+            models.Index(
+                fields=["doctor", "scheduled_time", "end_time"],
+                condition=models.Q(status="scheduled"),
+                name="appt_doc_time_sched_idx",
+            ),
+            # Backs the default ordering for unfiltered (staff) listings
+            models.Index(fields=["scheduled_time"], name="appt_scheduled_time_idx"),
+        ]
 
     def __str__(self):
         return f"{self.patient} with {self.doctor} at {self.scheduled_time}"
 
-    def save(self, *args, **kwargs):
-        # Calculate end_time if not set
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what end_time was derived from, so a reschedule or a new
+        # visit type recomputes it
+        instance._end_time_source = (
+            instance.__dict__.get("scheduled_time"),
+            instance.__dict__.get("visit_type_id"),
+        )
+        return instance
+
+    def save(self, *args, skip_validation=False, **kwargs):
+        # Calculate end_time if not set or no longer current
         self.calculate_end_time()
 
-        # Run validation
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Lock the doctor so the overlap check and the write run atomically
+        with transaction.atomic():
+            # Callers passing skip_validation must have validated the
+            # appointment under the doctor lock in the same transaction
+            if not skip_validation:
+                self.lock_doctor()
+
+                # Run validation
+                self.full_clean()
+            super().save(*args, **kwargs)
+
+    def lock_doctor(self):
+        """Serialize bookings for this doctor until the transaction ends"""
+        Doctor.objects.select_for_update().filter(pk=self.doctor_id).first()
 
     def calculate_end_time(self):
         """Calculate end_time based on visit_type duration"""
-        if self.visit_type and self.scheduled_time and not self.end_time:
-            from datetime import timedelta
-
+        # Keep a stored end_time while its start and visit type are unchanged,
+        # so a loaded row never fetches its visit type
+        source = (self.scheduled_time, self.visit_type_id)
+        if self.end_time and getattr(self, "_end_time_source", source) == source:
+            return
+        if self.scheduled_time and self.visit_type_id:
             self.end_time = self.scheduled_time + timedelta(
                 minutes=self.visit_type.duration_minutes
             )
+            self._end_time_source = source
 
     def clean(self):
         """Validate that appointment doesn't overlap with existing appointments"""
@@ -123,19 +258,22 @@ class Appointment(models.Model):
         # Ensure end_time is calculated
         self.calculate_end_time()
 
-        if self.doctor and self.scheduled_time and self.end_time:
+        if self.doctor_id and self.scheduled_time and self.end_time:
             # Check for overlapping appointments with the same doctor
-            overlapping = (
-                Appointment.objects.filter(doctor=self.doctor, status="scheduled")
+            # Fetch the first conflict directly instead of exists() + first()
+            conflict = (
+                Appointment.objects.filter(doctor_id=self.doctor_id, status="scheduled")
                 .exclude(pk=self.pk if self.pk else None)
                 .filter(
                     scheduled_time__lt=self.end_time, end_time__gt=self.scheduled_time
                 )
+                .only("scheduled_time", "end_time")
+                .first()
             )
 
-            if overlapping.exists():
+            if conflict is not None:
                 raise ValidationError(
                     f"This appointment overlaps with an existing appointment. "
-                    f"Doctor has an appointment from {overlapping.first().scheduled_time} "
-                    f"to {overlapping.first().end_time}."
+                    f"Doctor has an appointment from {conflict.scheduled_time} "
+                    f"to {conflict.end_time}."
                 )
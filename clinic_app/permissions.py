@@ -1,42 +1,60 @@
 from rest_framework import permissions
 
 
+def is_patient(request):
+    """Check if user is a patient, caching the answer on the request"""
+    if not hasattr(request, "_is_patient"):
+        request._is_patient = hasattr(request.user, "patient")
+    return request._is_patient
+
+
+def is_doctor(request):
+    """Check if user is a doctor, caching the answer on the request"""
+    if not hasattr(request, "_is_doctor"):
+        request._is_doctor = hasattr(request.user, "doctor")
+    return request._is_doctor
+
+
 class IsPatient(permissions.BasePermission):
     """Check if user is a patient"""
 
     def has_permission(self, request, view):
-        return hasattr(request.user, "patient")
+        return is_patient(request)
 
 
 class IsDoctor(permissions.BasePermission):
     """Check if user is a doctor"""
 
     def has_permission(self, request, view):
-        return hasattr(request.user, "doctor")
+        return is_doctor(request)
 
 
 class IsClinicStaff(permissions.BasePermission):
     """Check if user is clinic staff (can be extended later)"""
 
     def has_permission(self, request, view):
-        return request.user.is_staff or hasattr(request.user, "doctor")
+        return request.user.is_staff or is_doctor(request)
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """Object-level permission to only allow owners of an object to edit it."""
 
     def has_object_permission(self, request, view, obj):
+        # Superusers may edit anything, no role lookup needed
+        if request.user.is_superuser:
+            return True
+
         # Read permissions are allowed to any request
         if request.method in permissions.SAFE_METHODS:
             return True
 
         # Check if user is patient and owns the appointment
-        if hasattr(request.user, "patient") and hasattr(obj, "patient"):
-            return obj.patient == request.user.patient
+        if is_patient(request) and hasattr(obj, "patient_id"):
+            return obj.patient_id == request.user.patient.pk
 
         # Check if user is doctor and owns the appointment/availability
-        if hasattr(request.user, "doctor") and hasattr(obj, "doctor"):
-            return obj.doctor == request.user.doctor
+        if is_doctor(request) and hasattr(obj, "doctor_id"):
+            return obj.doctor_id == request.user.doctor.pk
 
         return False
 
@@ -45,8 +63,10 @@ class IsPatientOwner(permissions.BasePermission):
     """Patient can only access their own data"""
 
     def has_object_permission(self, request, view, obj):
-        if hasattr(request.user, "patient"):
-            return obj.patient == request.user.patient
+        if request.user.is_superuser:
+            return True
+        if is_patient(request):
+            return obj.patient_id == request.user.patient.pk
         return False
 
 
@@ -54,6 +74,8 @@ class IsDoctorOwner(permissions.BasePermission):
     """Doctor can only access their own data"""
 
     def has_object_permission(self, request, view, obj):
-        if hasattr(request.user, "doctor"):
-            return obj.doctor == request.user.doctor
+        if request.user.is_superuser:
+            return True
+        if is_doctor(request):
+            return obj.doctor_id == request.user.doctor.pk
         return False
@@ -0,0 +1,16 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson, for hot read-only endpoints
+
+    orjson writes datetimes itself rather than in DRF's format, so use it for
+    responses whose data a serializer has already turned into strings.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=JSONEncoder().default)
@@ -1,7 +1,10 @@
+from datetime import timedelta
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.settings import api_settings
 from .models import (
     Clinic,
     VisitType,
@@ -12,6 +15,46 @@ from .models import (
 )
 
 
+def duplicate_registration_error(error, validated_data):
+    """Turn a unique constraint violation into a registration ValidationError"""
+    # The error text quotes the duplicate value, so never match on it.
+    # PostgreSQL names the violated constraint; elsewhere look the rows up.
+    diag = getattr(error.__cause__, "diag", None)
+    constraint = getattr(diag, "constraint_name", None)
+    if constraint is not None:
+        duplicate_username = "username" in constraint
+        duplicate_license = "license_number" in constraint
+    else:
+        duplicate_username = User.objects.filter(
+            username=validated_data["username"]
+        ).exists()
+        duplicate_license = (
+            "license_number" in validated_data
+            and Doctor.objects.filter(
+                license_number=validated_data["license_number"]
+            ).exists()
+        )
+
+    if duplicate_username:
+        detail = "Username already exists"
+    elif duplicate_license:
+        detail = "License number already exists"
+    else:
+        raise error
+    return serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [detail]})
+
+
+def create_registration_user(validated_data):
+    """Create the User row behind a doctor/patient registration"""
+    return User.objects.create_user(
+        username=validated_data["username"],
+        password=validated_data["password"],
+        email=validated_data["email"],
+        first_name=validated_data["first_name"],
+        last_name=validated_data["last_name"],
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -34,6 +77,10 @@ class VisitTypeSerializer(serializers.ModelSerializer):
 class DoctorSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
+    select_related_fields = ("user",)
+    # clinics is a many-to-many, rendered as a list of ids
+    prefetch_related_fields = ("clinics",)
+
     class Meta:
         model = Doctor
         fields = "__all__"
@@ -42,32 +89,32 @@ class DoctorSerializer(serializers.ModelSerializer):
 class PatientSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
+    select_related_fields = ("user",)
+
     class Meta:
         model = Patient
         fields = "__all__"
 
 
 class DoctorClinicAvailabilitySerializer(serializers.ModelSerializer):
-    doctor_name = serializers.CharField(
-        source="doctor.user.get_full_name", read_only=True
-    )
+    doctor_name = serializers.CharField(source="doctor.full_name", read_only=True)
     clinic_name = serializers.CharField(source="clinic.name", read_only=True)
 
+    select_related_fields = ("doctor", "clinic")
+
     class Meta:
         model = DoctorClinicAvailability
         fields = "__all__"
 
 
 class AppointmentSerializer(serializers.ModelSerializer):
-    patient_name = serializers.CharField(
-        source="patient.user.get_full_name", read_only=True
-    )
-    doctor_name = serializers.CharField(
-        source="doctor.user.get_full_name", read_only=True
-    )
+    patient_name = serializers.CharField(source="patient.full_name", read_only=True)
+    doctor_name = serializers.CharField(source="doctor.full_name", read_only=True)
     clinic_name = serializers.CharField(source="clinic.name", read_only=True)
     visit_type_name = serializers.CharField(source="visit_type.name", read_only=True)
 
+    select_related_fields = ("patient", "doctor", "clinic", "visit_type")
+
     class Meta:
         model = Appointment
         fields = "__all__"
@@ -75,8 +122,24 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Custom validation to prevent double booking"""
-        # Call model's clean method for validation
-        instance = Appointment(**data)
+        # Call model's clean method for validation; an update checks the
+        # merged row under its own pk, with end_time derived afresh
+        if self.instance is not None:
+            fields = {
+                field.attname: getattr(self.instance, field.attname)
+                for field in Appointment._meta.concrete_fields
+                if field.attname != "end_time"
+            }
+            instance = Appointment(**fields)
+            for attr, value in data.items():
+                setattr(instance, attr, value)
+        else:
+            instance = Appointment(**data)
+
+        # Inside a transaction, hold the doctor lock until create() saves
+        if transaction.get_connection().in_atomic_block:
+            instance.lock_doctor()
+
         try:
             instance.clean()
         except ValidationError as e:
@@ -90,13 +153,14 @@ class AppointmentSerializer(serializers.ModelSerializer):
         scheduled_time = validated_data.get("scheduled_time")
 
         if visit_type and scheduled_time:
-            from datetime import timedelta
-
             validated_data["end_time"] = scheduled_time + timedelta(
                 minutes=visit_type.duration_minutes
             )
 
-        return super().create(validated_data)
+        # validate() already ran the overlap check, so skip full_clean()
+        instance = Appointment(**validated_data)
+        instance.save(skip_validation=True)
+        return instance
 
 
 class PatientRegistrationSerializer(serializers.ModelSerializer):
@@ -127,37 +191,25 @@ class PatientRegistrationSerializer(serializers.ModelSerializer):
         if data["password"] != data["confirm_password"]:
             raise serializers.ValidationError("Passwords do not match")
 
-        if User.objects.filter(username=data["username"]).exists():
-            raise serializers.ValidationError("Username already exists")
-
         if User.objects.filter(email=data["email"]).exists():
             raise serializers.ValidationError("Email already exists")
 
         return data
 
     def create(self, validated_data):
-        user_data = {
-            "username": validated_data["username"],
-            "password": validated_data["password"],
-            "email": validated_data["email"],
-            "first_name": validated_data["first_name"],
-            "last_name": validated_data["last_name"],
-        }
-
-        user = User.objects.create_user(
-            username=user_data["username"],
-            password=user_data["password"],
-            email=user_data["email"],
-            first_name=user_data["first_name"],
-            last_name=user_data["last_name"],
-        )
-
-        patient = Patient.objects.create(
-            user=user,
-            date_of_birth=validated_data["date_of_birth"],
-            phone=validated_data["phone"],
-            emergency_contact=validated_data.get("emergency_contact", ""),
-        )
+        # Unique constraints catch duplicate usernames without a pre-check
+        try:
+            with transaction.atomic():
+                user = create_registration_user(validated_data)
+
+                patient = Patient.objects.create(
+                    user=user,
+                    date_of_birth=validated_data["date_of_birth"],
+                    phone=validated_data["phone"],
+                    emergency_contact=validated_data.get("emergency_contact", ""),
+                )
+        except IntegrityError as e:
+            raise duplicate_registration_error(e, validated_data)
 
         return patient
 
@@ -184,44 +236,32 @@ class DoctorRegistrationSerializer(serializers.ModelSerializer):
             "specialization",
             "license_number",
         ]
+        # Uniqueness is enforced by the database in create()
+        extra_kwargs = {"license_number": {"validators": []}}
 
     def validate(self, data):
         if data["password"] != data["confirm_password"]:
             raise serializers.ValidationError("Passwords do not match")
 
-        if User.objects.filter(username=data["username"]).exists():
-            raise serializers.ValidationError("Username already exists")
-
         if User.objects.filter(email=data["email"]).exists():
             raise serializers.ValidationError("Email already exists")
 
-        if Doctor.objects.filter(license_number=data["license_number"]).exists():
-            raise serializers.ValidationError("License number already exists")
-
         return data
 
     def create(self, validated_data):
-        user_data = {
-            "username": validated_data["username"],
-            "password": validated_data["password"],
-            "email": validated_data["email"],
-            "first_name": validated_data["first_name"],
-            "last_name": validated_data["last_name"],
-        }
-
-        user = User.objects.create_user(
-            username=user_data["username"],
-            password=user_data["password"],
-            email=user_data["email"],
-            first_name=user_data["first_name"],
-            last_name=user_data["last_name"],
-        )
-
-        doctor = Doctor.objects.create(
-            user=user,
-            specialization=validated_data["specialization"],
-            license_number=validated_data["license_number"],
-        )
+        # Unique constraints catch duplicate usernames and license numbers
+        # without a pre-check
+        try:
+            with transaction.atomic():
+                user = create_registration_user(validated_data)
+
+                doctor = Doctor.objects.create(
+                    user=user,
+                    specialization=validated_data["specialization"],
+                    license_number=validated_data["license_number"],
+                )
+        except IntegrityError as e:
+            raise duplicate_registration_error(e, validated_data)
 
         return doctor
 
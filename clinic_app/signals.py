@@ -0,0 +1,61 @@
+from functools import partial
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .caching import (
+    forget_token,
+    forget_user_token,
+    invalidate_clinic_list,
+    invalidate_doctor_slots,
+)
+from .models import Appointment, Clinic, Doctor, DoctorClinicAvailability, Patient
+
+
+@receiver(post_save, sender=User)
+def sync_full_name(sender, instance, created=False, update_fields=None, **kwargs):
+    """Copy a renamed user's full name onto their doctor/patient profile"""
+    # A new user has no profile yet; the profile's save() copies the name
+    if created:
+        return
+
+    if update_fields and not {"first_name", "last_name"} & set(update_fields):
+        return
+
+    full_name = instance.get_full_name()
+    Doctor.objects.filter(user=instance).update(full_name=full_name)
+    Patient.objects.filter(user=instance).update(full_name=full_name)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=DoctorClinicAvailability)
+@receiver(post_delete, sender=DoctorClinicAvailability)
+def invalidate_available_slots(sender, instance, **kwargs):
+    """Drop cached available slots once a doctor's schedule change commits"""
+    transaction.on_commit(partial(invalidate_doctor_slots, instance.doctor_id))
+
+
+@receiver(post_save, sender=Clinic)
+@receiver(post_delete, sender=Clinic)
+def invalidate_cached_clinic_list(sender, instance, **kwargs):
+    """Drop the cached clinic list once a clinic change commits"""
+    transaction.on_commit(invalidate_clinic_list)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop serving a cached token once its deletion commits"""
+    transaction.on_commit(partial(forget_token, instance.key))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def forget_cached_token(sender, instance, **kwargs):
+    """Stop serving a cached token once its user or their profile changes"""
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(partial(forget_user_token, user_id))
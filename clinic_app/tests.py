@@ -1,7 +1,12 @@
-from django.test import TestCase
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import IntegrityError, connection
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from datetime import datetime, timedelta, time
 from .models import (
     Clinic,
@@ -11,12 +16,14 @@ from .models import (
     DoctorClinicAvailability,
     Appointment,
 )
+from .serializers import duplicate_registration_error
 
 
 class AppointmentSchedulingTests(APITestCase):
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         # Create clinic
-        self.clinic = Clinic.objects.create(
+        cls.clinic = Clinic.objects.create(
             name="Test Clinic",
             address="123 Test St",
             phone="555-1234",
@@ -26,22 +33,22 @@ class AppointmentSchedulingTests(APITestCase):
         )
 
         # Create visit type
-        self.visit_type = VisitType.objects.create(
-            name="Consultation", duration_minutes=30, clinic=self.clinic
+        cls.visit_type = VisitType.objects.create(
+            name="Consultation", duration_minutes=30, clinic=cls.clinic
         )
 
         # Create doctor
         doctor_user = User.objects.create_user(
             username="doctor", password="doctor123", first_name="John", last_name="Doe"
         )
-        self.doctor = Doctor.objects.create(
+        cls.doctor = Doctor.objects.create(
             user=doctor_user, specialization="Cardiology", license_number="DOC123"
         )
 
         # Create availability
-        self.availability = DoctorClinicAvailability.objects.create(
-            doctor=self.doctor,
-            clinic=self.clinic,
+        cls.availability = DoctorClinicAvailability.objects.create(
+            doctor=cls.doctor,
+            clinic=cls.clinic,
             day_of_week=1,  # Monday
             start_time=time(9, 0),
             end_time=time(17, 0),
@@ -90,11 +97,9 @@ class AppointmentSchedulingTests(APITestCase):
             "/api/appointments/", appointment_data, format="json"
         )
 
-        # Debug output
-        print(f"Appointment Creation Response Status: {response.status_code}")
-        print(f"Appointment Creation Response Data: {response.data}")
-
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED, msg=response.data
+        )
 
         # Verify appointment was created with correct patient
         appointment = Appointment.objects.first()
@@ -143,11 +148,9 @@ class AppointmentSchedulingTests(APITestCase):
             "/api/appointments/", appointment_data, format="json"
         )
 
-        # Debug output
-        print(f"Staff Appointment Creation Response Status: {response.status_code}")
-        print(f"Staff Appointment Creation Response Data: {response.data}")
-
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED, msg=response.data
+        )
 
         # Verify appointment was created
         self.assertTrue(Appointment.objects.filter(patient=patient).exists())
@@ -183,10 +186,9 @@ class AppointmentSchedulingTests(APITestCase):
             "/api/appointments/", appointment_data1, format="json"
         )
 
-        print(f"First Appointment Response Status: {response1.status_code}")
-        print(f"First Appointment Response Data: {response1.data}")
-
-        self.assertEqual(response1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response1.status_code, status.HTTP_201_CREATED, msg=response1.data
+        )
 
         # Try to create overlapping appointment (15 minutes later - should overlap)
         appointment_data2 = {
@@ -200,13 +202,10 @@ class AppointmentSchedulingTests(APITestCase):
             "/api/appointments/", appointment_data2, format="json"
         )
 
-        print(
-            f"Second Appointment (Overlapping) Response Status: {response2.status_code}"
-        )
-        print(f"Second Appointment Response Data: {response2.data}")
-
         # Should fail with 400 Bad Request
-        self.assertEqual(response2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response2.status_code, status.HTTP_400_BAD_REQUEST, msg=response2.data
+        )
         self.assertIn("overlap", str(response2.data).lower())
 
         # Try to create non-overlapping appointment (should succeed)
@@ -221,12 +220,475 @@ class AppointmentSchedulingTests(APITestCase):
             "/api/appointments/", appointment_data3, format="json"
         )
 
-        print(
-            f"Third Appointment (Non-overlapping) Response Status: {response3.status_code}"
+        self.assertEqual(
+            response3.status_code, status.HTTP_201_CREATED, msg=response3.data
         )
-        print(f"Third Appointment Response Data: {response3.data}")
-
-        self.assertEqual(response3.status_code, status.HTTP_201_CREATED)
 
         # Clean up authentication
         self.client.force_authenticate(user=None)
+
+
+class BearerTokenAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        doctor_user = User.objects.create_user(
+            username="doctor", password="doctor123", first_name="John", last_name="Doe"
+        )
+        doctor = Doctor.objects.create(
+            user=doctor_user, specialization="Cardiology", license_number="DOC123"
+        )
+        cls.doctor_token = Token.objects.create(user=doctor_user)
+        for name in ("North Clinic", "South Clinic"):
+            clinic = Clinic.objects.create(
+                name=name,
+                address="1 Main St",
+                phone="555-0000",
+                email="clinic@example.com",
+                operating_hours_start=time(9, 0),
+                operating_hours_end=time(17, 0),
+            )
+            DoctorClinicAvailability.objects.create(
+                doctor=doctor,
+                clinic=clinic,
+                day_of_week=1,
+                start_time=time(9, 0),
+                end_time=time(17, 0),
+            )
+
+        patient_user = User.objects.create_user(
+            username="patient", password="patient123"
+        )
+        Patient.objects.create(
+            user=patient_user, date_of_birth="1990-01-01", phone="555-5678"
+        )
+        cls.patient_token = Token.objects.create(user=patient_user)
+
+    def test_role_checks_use_profile_loaded_with_token(self):
+        """Test the doctor profile is joined when the token is authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.doctor_token.key}")
+
+        # One query for the token, user and profiles, one for the list
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/availability/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_availability_names_joined_into_list_query(self):
+        """Test doctor and clinic names don't cost a query per row"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.doctor_token.key}")
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/availability/")
+
+        self.assertEqual(
+            sorted(row["clinic_name"] for row in response.data),
+            ["North Clinic", "South Clinic"],
+        )
+        self.assertEqual(response.data[0]["doctor_name"], "John Doe")
+
+    def test_role_checks_reject_other_roles(self):
+        """Test a patient token is refused by doctor-only endpoints"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.patient_token.key}")
+
+        response = self.client.get("/api/availability/")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        CACHE_AUTH_TOKENS=True,
+    )
+    def test_token_lookup_cached_until_logout(self):
+        """Test a cached token skips the auth query and logout revokes it"""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.doctor_token.key}")
+        self.client.get("/api/availability/")
+
+        # Only the availability list itself hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/availability/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/auth/logout/")
+
+        response = self.client.get("/api/availability/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        CACHE_AUTH_TOKENS=True,
+    )
+    def test_cached_token_holds_no_password_hash(self):
+        """Test the cache keeps field values, not the user's password hash"""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.patient_token.key}")
+        self.client.get("/api/auth/profile/")
+
+        entry = cache.get(f"auth-token:{self.patient_token.key}:0")
+        self.assertNotIn("password", entry["user"])
+        self.assertIsNone(entry["doctor"])
+
+        # The profile is rebuilt from the cached values without a query
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/profile/")
+        self.assertTrue(response.data["is_patient"])
+        self.assertEqual(response.data["patient"]["phone"], "555-5678")
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_token_lookup_uncached_by_default(self):
+        """Test tokens aren't cached unless a shared cache is configured"""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.doctor_token.key}")
+        self.client.get("/api/availability/")
+
+        # A per-process cache can't be revoked everywhere, so look up again
+        with self.assertNumQueries(2):
+            self.client.get("/api/availability/")
+
+    def test_change_password_rotates_token_key(self):
+        """Test the token key is replaced in place and the old key stops working"""
+        old_key = self.patient_token.key
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {old_key}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/auth/change-password/",
+                {
+                    "old_password": "patient123",
+                    "new_password": "n3w-Secret!",
+                    "confirm_password": "n3w-Secret!",
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        new_key = response.data["token"]
+        self.assertNotEqual(new_key, old_key)
+        token_writes = [
+            q["sql"]
+            for q in queries.captured_queries
+            if "authtoken_token" in q["sql"] and not q["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(len(token_writes), 1)
+        self.assertTrue(token_writes[0].startswith("UPDATE"))
+
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {new_key}")
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_reports_roles_from_one_profile_query(self):
+        """Test login joins both profiles instead of probing each one"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/auth/login/",
+                {"username": "patient", "password": "patient123"},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_patient"])
+        self.assertFalse(response.data["is_doctor"])
+        profile_queries = [
+            q["sql"]
+            for q in queries.captured_queries
+            if "clinic_app_patient" in q["sql"] or "clinic_app_doctor" in q["sql"]
+        ]
+        self.assertEqual(len(profile_queries), 1, msg=profile_queries)
+
+
+class RegistrationTests(APITestCase):
+    def setUp(self):
+        self.doctor_data = {
+            "username": "dr_house",
+            "password": "Diagnostic#2024",
+            "confirm_password": "Diagnostic#2024",
+            "email": "house@clinic.com",
+            "first_name": "Gregory",
+            "last_name": "House",
+            "specialization": "Diagnostics",
+            "license_number": "LIC001",
+        }
+
+    def test_duplicate_username_rejected(self):
+        """Test the username unique constraint is reported as a 400"""
+        response = self.client.post(
+            "/api/auth/doctor/register/", self.doctor_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        duplicate = {**self.doctor_data, "email": "other@clinic.com"}
+        duplicate["license_number"] = "LIC002"
+        response = self.client.post(
+            "/api/auth/doctor/register/", duplicate, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Username already exists", str(response.data))
+
+    def test_duplicate_license_rejected_without_orphan_user(self):
+        """Test a duplicate license number rolls back the new user"""
+        # The value mentions "username" so the error text can't be matched on
+        self.doctor_data["license_number"] = "username-007"
+        response = self.client.post(
+            "/api/auth/doctor/register/", self.doctor_data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        duplicate = {
+            **self.doctor_data,
+            "username": "dr_wilson",
+            "email": "wilson@clinic.com",
+        }
+        response = self.client.post(
+            "/api/auth/doctor/register/", duplicate, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("License number already exists", str(response.data))
+        self.assertFalse(User.objects.filter(username="dr_wilson").exists())
+
+    def test_duplicate_error_ignores_values_in_message(self):
+        """Test the duplicate value quoted in the error can't pick the message"""
+        doctor_user = User.objects.create(username="dr_house")
+        Doctor.objects.create(
+            user=doctor_user, specialization="Diagnostics", license_number="username-7"
+        )
+        error = IntegrityError(
+            'duplicate key value violates unique constraint "clinic_app_doctor_'
+            'license_number_key"\nDETAIL:  Key (license_number)=(username-7) '
+            "already exists."
+        )
+
+        detail = duplicate_registration_error(
+            error, {"username": "dr_wilson", "license_number": "username-7"}
+        ).detail
+
+        self.assertIn("License number already exists", str(detail))
+
+    def test_registration_writes_user_and_profile_only(self):
+        """Test registering a patient writes only the user, profile and token"""
+        patient_data = {
+            "username": "jane_doe",
+            "password": "Checkup#2024",
+            "confirm_password": "Checkup#2024",
+            "email": "jane@example.com",
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "date_of_birth": "1990-01-01",
+            "phone": "555-1234",
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/auth/patient/register/", patient_data, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        writes = [
+            q["sql"]
+            for q in queries.captured_queries
+            if not q["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE"))
+            and "authtoken_token" not in q["sql"]
+        ]
+        self.assertEqual(len(writes), 2, msg=writes)
+        # A new user can't have a token yet, so it's inserted without a lookup
+        token_queries = [
+            q["sql"] for q in queries.captured_queries if "authtoken_token" in q["sql"]
+        ]
+        self.assertEqual(len(token_queries), 1, msg=token_queries)
+        self.assertEqual(
+            Patient.objects.get(user__username="jane_doe").full_name, "Jane Doe"
+        )
+
+
+class ProfileFullNameTests(TestCase):
+    def test_full_name_follows_user_renames(self):
+        """Test doctor/patient names are copied from the user and kept in sync"""
+        user = User.objects.create_user(
+            username="doctor", password="doctor123", first_name="John", last_name="Doe"
+        )
+        doctor = Doctor.objects.create(
+            user=user, specialization="Cardiology", license_number="DOC123"
+        )
+        self.assertEqual(doctor.full_name, "John Doe")
+
+        user.last_name = "Smith"
+        user.save()
+
+        doctor.refresh_from_db()
+        self.assertEqual(doctor.full_name, "John Smith")
+        self.assertEqual(str(doctor), "Dr. John Smith")
+
+
+class DoctorListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinic = Clinic.objects.create(
+            name="Main Clinic",
+            address="1 Main St",
+            phone="555-0000",
+            email="clinic@example.com",
+            operating_hours_start=time(9, 0),
+            operating_hours_end=time(17, 0),
+        )
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+
+    def _add_doctor(self, n):
+        user = User.objects.create(username=f"doctor{n}", first_name=f"Doc {n}")
+        doctor = Doctor.objects.create(
+            user=user, specialization="General", license_number=f"LIC{n}"
+        )
+        DoctorClinicAvailability.objects.create(
+            doctor=doctor,
+            clinic=self.clinic,
+            day_of_week=1,
+            start_time=time(9, 0),
+            end_time=time(17, 0),
+        )
+
+    def test_doctor_list_query_count_is_constant(self):
+        """Test each listed doctor's clinics don't cost a query per row"""
+        self.client.force_authenticate(user=self.staff)
+        self._add_doctor(0)
+
+        # Count, doctors joined with users, and one prefetch of their clinics
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/doctors/")
+        self.assertEqual(response.data["results"][0]["clinics"], [self.clinic.id])
+
+        for n in range(1, 5):
+            self._add_doctor(n)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/doctors/")
+        self.assertEqual(response.data["count"], 5)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ClinicListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Clinic.objects.bulk_create(
+            Clinic(
+                name=f"Clinic {i:02d}",
+                address="1 Main St",
+                phone="555-0000",
+                email="clinic@example.com",
+                operating_hours_start=time(9, 0),
+                operating_hours_end=time(17, 0),
+            )
+            for i in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_clinic_list_paginated_and_cached_until_clinic_changes(self):
+        """Test clinic pages are bounded, cached, and dropped on clinic saves"""
+        response = self.client.get("/api/clinics/")
+        self.assertEqual(response.json()["count"], 60)
+        self.assertEqual(len(response.data["results"]), 50)
+        self.assertIsNotNone(response.data["next"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/clinics/")
+        self.assertEqual(response.data["results"][0]["name"], "Clinic 00")
+
+        clinic = Clinic.objects.get(name="Clinic 00")
+        clinic.name = "Clinic 00 (renamed)"
+        with self.captureOnCommitCallbacks(execute=True):
+            clinic.save()
+
+        response = self.client.get("/api/clinics/")
+        self.assertEqual(response.data["results"][0]["name"], "Clinic 00 (renamed)")
+
+    def test_clinic_list_cache_keyed_on_page_only(self):
+        """Test query strings can't add cache entries and links follow the host"""
+        self.client.get("/api/clinics/?page=2")
+
+        response = self.client.get("/api/clinics/?page=2&x=1")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/clinics/?page=2", HTTP_HOST="other.test")
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(response.data["previous"], "http://other.test/api/clinics/")
+        self.assertIsNone(response.data["next"])
+
+        for page in ("3", "²"):
+            response = self.client.get("/api/clinics/", {"page": page})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CACHE_AUTH_TOKENS=True,
+)
+class ChangePasswordTokenCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="patient", password="patient123")
+        Patient.objects.create(user=user, date_of_birth="1990-01-01", phone="555")
+        self.old_key = Token.objects.create(user=user).key
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.old_key}")
+
+    def test_old_key_not_recached_during_password_change(self):
+        """Test a request racing the key rotation can't keep the old key alive"""
+        self.client.get("/api/auth/profile/")
+        racing_client = APIClient()
+        racing_client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.old_key}")
+        generate_key = Token.generate_key
+
+        def race_then_generate():
+            # Lands after the password is saved but before the key changes
+            racing_client.get("/api/auth/profile/")
+            return generate_key()
+
+        with mock.patch.object(Token, "generate_key", side_effect=race_then_generate):
+            response = self.client.post(
+                "/api/auth/change-password/",
+                {
+                    "old_password": "patient123",
+                    "new_password": "n3w-Secret!",
+                    "confirm_password": "n3w-Secret!",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_cached_late_is_not_served_after_logout(self):
+        """Test a lookup that read the token before a logout can't re-cache it"""
+        from . import authentication
+
+        logout_client = APIClient()
+        logout_client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.old_key}")
+        cache_token = authentication.cache_token
+
+        def logout_then_cache(*args):
+            # Lands after the token row was read but before it is cached
+            mock_cache_token.side_effect = cache_token
+            logout_client.post("/api/auth/logout/")
+            cache_token(*args)
+
+        with mock.patch.object(
+            authentication, "cache_token", side_effect=logout_then_cache
+        ) as mock_cache_token:
+            self.client.get("/api/auth/profile/")
+
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -27,5 +27,6 @@ urlpatterns = [
     path('availability/', views.DoctorClinicAvailabilityListCreateView.as_view(), name='availability-list'),
     path('availability/<int:pk>/', views.DoctorClinicAvailabilityDetailView.as_view(), name='availability-detail'),
     path('appointments/', views.AppointmentListCreateView.as_view(), name='appointment-list'),
+    path('appointments/fast/', views.appointment_fast_list, name='appointment-fast-list'),
     path('appointments/<int:pk>/', views.AppointmentDetailView.as_view(), name='appointment-detail'),
 ]
\ No newline at end of file
@@ -1,11 +1,19 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
-from django.db.models import Q
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F, Q
+from django.views.decorators.http import conditional_page
 from datetime import datetime, timedelta, time
+from functools import lru_cache, partial
 from django.utils import timezone
 from .models import (
     Clinic,
@@ -27,6 +35,14 @@ from .serializers import (
     DoctorClinicAvailabilitySerializer,
     AppointmentSerializer,
 )
+from .caching import (
+    CLINIC_LIST_CACHE_TIMEOUT,
+    SLOTS_CACHE_TIMEOUT,
+    clinic_list_cache_key,
+    forget_token,
+    slots_cache_key,
+)
+from .renderers import ORJSONRenderer
 from .permissions import (
     IsPatient,
     IsDoctor,
@@ -34,9 +50,29 @@ from .permissions import (
     IsOwnerOrReadOnly,
     IsPatientOwner,
     IsDoctorOwner,
+    is_doctor,
+    is_patient,
 )
 
 
+class SelectRelatedMixin:
+    """Load the relations the serializer lists to select or prefetch"""
+
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        fields = getattr(serializer_class, "select_related_fields", ())
+        prefetch = getattr(serializer_class, "prefetch_related_fields", ())
+        return (
+            super().get_queryset().select_related(*fields).prefetch_related(*prefetch)
+        )
+
+
+class ListPagination(PageNumberPagination):
+    """Page size for the lists that may grow without bound"""
+
+    page_size = 50
+
+
 # Authentication Views
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -48,6 +84,9 @@ def login(request):
             password=serializer.validated_data["password"],
         )
         if user:
+            # Reload with both profiles joined so the role flags below
+            # don't each run their own query
+            user = User.objects.select_related("doctor", "patient").get(pk=user.pk)
             token, created = Token.objects.get_or_create(user=user)
             return Response(
                 {
@@ -86,8 +125,10 @@ def logout(request):
 def patient_register(request):
     serializer = PatientRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        patient = serializer.save()
-        token, created = Token.objects.get_or_create(user=patient.user)
+        # Commit the user, profile and token together
+        with transaction.atomic():
+            patient = serializer.save()
+            token = Token.objects.create(user=patient.user)
 
         return Response(
             {
@@ -108,8 +149,10 @@ def patient_register(request):
 def doctor_register(request):
     serializer = DoctorRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        doctor = serializer.save()
-        token, created = Token.objects.get_or_create(user=doctor.user)
+        # Commit the user, profile and token together
+        with transaction.atomic():
+            doctor = serializer.save()
+            token = Token.objects.create(user=doctor.user)
 
         return Response(
             {
@@ -137,14 +180,14 @@ def user_profile(request):
         "email": user.email,
         "first_name": user.first_name,
         "last_name": user.last_name,
-        "is_doctor": hasattr(user, "doctor"),
-        "is_patient": hasattr(user, "patient"),
+        "is_doctor": is_doctor(request),
+        "is_patient": is_patient(request),
         "is_staff": user.is_staff,
     }
 
-    if hasattr(user, "patient"):
+    if is_patient(request):
         profile_data["patient"] = PatientSerializer(user.patient).data
-    if hasattr(user, "doctor"):
+    if is_doctor(request):
         profile_data["doctor"] = DoctorSerializer(user.doctor).data
 
     return Response(profile_data)
@@ -163,30 +206,70 @@ def change_password(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        user.set_password(serializer.validated_data["new_password"])
-        user.save()
+        # Rotate the token key in place, and orphan the cached copy of the
+        # old key once the new one is committed
+        with transaction.atomic():
+            user.set_password(serializer.validated_data["new_password"])
+            user.save()
 
-        # Update token
-        Token.objects.filter(user=user).delete()
-        new_token = Token.objects.create(user=user)
+            tokens = Token.objects.filter(user=user)
+            old_keys = list(tokens.values_list("key", flat=True))
+            new_key = Token.generate_key()
+            if not tokens.update(key=new_key):
+                Token.objects.create(user=user, key=new_key)
+            for old_key in old_keys:
+                transaction.on_commit(partial(forget_token, old_key))
 
-        return Response(
-            {"message": "Password changed successfully", "token": new_token.key}
-        )
+        return Response({"message": "Password changed successfully", "token": new_key})
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 # Clinic Views - Public read, Admin write
 class ClinicListCreateView(generics.ListCreateAPIView):
-    queryset = Clinic.objects.all()
+    queryset = Clinic.objects.order_by("name", "id")
     serializer_class = ClinicSerializer
+    pagination_class = ListPagination
+    renderer_classes = [ORJSONRenderer]
 
     def get_permissions(self):
         if self.request.method == "GET":
             return [AllowAny()]
         return [IsAdminUser()]
 
+    def list(self, request, *args, **kwargs):
+        # Only ?page= is accepted, so junk query strings can't fill the cache
+        page_param = self.paginator.page_query_param
+        unknown = sorted(set(request.query_params) - {page_param})
+        if unknown:
+            return Response(
+                {"error": f"Unknown query parameters: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        page_number = request.query_params.get(page_param, "1")
+        # isdigit() alone accepts digits such as "²" that int() rejects
+        if not (page_number.isascii() and page_number.isdigit()):
+            return super().list(request, *args, **kwargs)
+
+        # Pages are the same for every caller; clinic changes invalidate them
+        cache_key = clinic_list_cache_key(int(page_number))
+        cached = cache.get(cache_key)
+        if cached is None:
+            response = super().list(request, *args, **kwargs)
+            cached = {
+                "count": response.data["count"],
+                "results": response.data["results"],
+            }
+            cache.set(cache_key, cached, CLINIC_LIST_CACHE_TIMEOUT)
+            return response
+
+        # The next/previous links use the caller's host, so rebuild them
+        self.paginator.request = request
+        self.paginator.page = Paginator(
+            range(cached["count"]), self.paginator.page_size
+        ).page(int(page_number))
+        return self.paginator.get_paginated_response(cached["results"])
+
 
 class ClinicDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Clinic.objects.all()
@@ -212,9 +295,10 @@ class VisitTypeDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Doctor Views
-class DoctorListCreateView(generics.ListCreateAPIView):
-    queryset = Doctor.objects.all()
+class DoctorListCreateView(SelectRelatedMixin, generics.ListCreateAPIView):
+    queryset = Doctor.objects.order_by("full_name", "id")
     serializer_class = DoctorSerializer
+    pagination_class = ListPagination
 
     def get_permissions(self):
         if self.request.method == "GET":
@@ -222,86 +306,121 @@ class DoctorListCreateView(generics.ListCreateAPIView):
         return [IsAdminUser()]
 
 
-class DoctorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DoctorDetailView(SelectRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     permission_classes = [IsAdminUser]
 
 
 # Patient Views - Admin only for list, patients can view own
-class PatientListCreateView(generics.ListCreateAPIView):
+class PatientListCreateView(SelectRelatedMixin, generics.ListCreateAPIView):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
     permission_classes = [IsAdminUser]
 
 
-class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PatientDetailView(SelectRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
     permission_classes = [IsAdminUser]
 
 
 # Availability Views
-class DoctorClinicAvailabilityListCreateView(generics.ListCreateAPIView):
+class DoctorClinicAvailabilityListCreateView(
+    SelectRelatedMixin, generics.ListCreateAPIView
+):
+    queryset = DoctorClinicAvailability.objects.all()
     serializer_class = DoctorClinicAvailabilitySerializer
     permission_classes = [IsAuthenticated, IsDoctor]
 
     def get_queryset(self):
-        if hasattr(self.request.user, "doctor"):
-            return DoctorClinicAvailability.objects.filter(
-                doctor=self.request.user.doctor
-            )
-        return DoctorClinicAvailability.objects.all()
+        queryset = super().get_queryset()
+        if is_doctor(self.request):
+            return queryset.filter(doctor=self.request.user.doctor)
+        return queryset
 
     def perform_create(self, serializer):
-        if hasattr(self.request.user, "doctor"):
+        if is_doctor(self.request):
             serializer.save(doctor=self.request.user.doctor)
 
 
-class DoctorClinicAvailabilityDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DoctorClinicAvailabilityDetailView(
+    SelectRelatedMixin, generics.RetrieveUpdateDestroyAPIView
+):
     queryset = DoctorClinicAvailability.objects.all()
     serializer_class = DoctorClinicAvailabilitySerializer
     permission_classes = [IsAuthenticated, IsDoctorOwner]
 
 
-class AppointmentListCreateView(generics.ListCreateAPIView):
+def visible_appointments(request, queryset):
+    """Limit an appointment queryset to the ones the user may see"""
+    user = request.user
+    if is_patient(request):
+        return queryset.filter(patient=user.patient)
+    if is_doctor(request):
+        return queryset.filter(doctor=user.doctor)
+    if user.is_staff:
+        return queryset
+    return queryset.none()
+
+
+class AppointmentListCreateView(SelectRelatedMixin, generics.ListCreateAPIView):
+    queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
+    # Columns the appointment list renders; everything else is deferred
+    list_only_fields = (
+        "id",
+        "patient__full_name",
+        "doctor__full_name",
+        "clinic__name",
+        "visit_type__name",
+        "scheduled_time",
+        "end_time",
+        "status",
+        "notes",
+        "created_at",
+    )
 
-        if hasattr(user, "patient"):
-            return Appointment.objects.filter(patient=user.patient)
-        if hasattr(user, "doctor"):
-            return Appointment.objects.filter(doctor=user.doctor)
-        if user.is_staff:
-            return Appointment.objects.all()
-        return Appointment.objects.none()
+    def get_queryset(self):
+        queryset = super().get_queryset().only(*self.list_only_fields)
+        return visible_appointments(self.request, queryset)
 
     def create(self, request, *args, **kwargs):
         # Handle patient assignment and validation
         data = request.data.copy()
 
-        # If user is a patient, auto-assign them and prevent assigning to others
-        if hasattr(request.user, "patient"):
-            if "patient" in data:
-                if int(data["patient"]) != request.user.patient.id:
-                    return Response(
-                        {"error": "You can only create appointments for yourself"},
-                        status=status.HTTP_403_FORBIDDEN,
-                    )
-            else:
-                # Auto-assign the current patient
-                data["patient"] = request.user.patient.id
+        # If user is a patient, auto-assign them and prevent assigning to others;
+        # the profile arrived with the token, so this reads no rows
+        if is_patient(request):
+            patient_id = request.user.patient.pk
+            try:
+                requested_id = int(data.get("patient", patient_id))
+            except (TypeError, ValueError):
+                return Response(
+                    {"patient": ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if requested_id != patient_id:
+                return Response(
+                    {"error": "You can only create appointments for yourself"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            # Auto-assign the current patient
+            data["patient"] = patient_id
 
         serializer = self.get_serializer(data=data)
-        serializer.is_valid(raise_exception=True)
 
-        try:
-            self.perform_create(serializer)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Validation locks the doctor, so the overlap check and the insert
+        # must share a transaction
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+
+            try:
+                self.perform_create(serializer)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         headers = self.get_success_headers(serializer.data)
         return Response(
@@ -312,14 +431,119 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 
-class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AppointmentDetailView(SelectRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def appointment_fast_list(request):
+    """List appointments from values() rows, bypassing the serializer"""
+    # Same keys as AppointmentSerializer so clients can switch endpoints
+    queryset = visible_appointments(request, Appointment.objects.all())
+    appointments = queryset.values(
+        "id",
+        "patient",
+        "doctor",
+        "clinic",
+        "visit_type",
+        "scheduled_time",
+        "end_time",
+        "status",
+        "notes",
+        "created_at",
+        patient_name=F("patient__full_name"),
+        doctor_name=F("doctor__full_name"),
+        clinic_name=F("clinic__name"),
+        visit_type_name=F("visit_type__name"),
+    )
+    return Response(list(appointments))
+
+
+@lru_cache(maxsize=256)
+def _candidate_slots(start_minute, end_minute, duration):
+    """Label and busy-minute mask of every 15-minute slot start in a window"""
+    slot_mask = (1 << duration) - 1
+    return tuple(
+        (f"{slot_start // 60:02d}:{slot_start % 60:02d}", slot_mask << slot_start)
+        for slot_start in range(start_minute, end_minute - duration + 1, 15)
+    )
+
+
+def build_available_slots(doctor_id, clinic_id, visit_type_id, date):
+    """Compute the available-slots response for one doctor, clinic and day"""
+    # Load just the columns the response and the slot arithmetic read
+    doctor = Doctor.objects.only("full_name").get(id=doctor_id)
+    clinic = Clinic.objects.only("name").get(id=clinic_id)
+    visit_type = VisitType.objects.only("name", "duration_minutes").get(
+        id=visit_type_id
+    )
+
+    # Check doctor availability
+    availability = (
+        DoctorClinicAvailability.objects.filter(
+            doctor_id=doctor_id, clinic_id=clinic_id, day_of_week=date.isoweekday()
+        )
+        .only("start_time", "end_time")
+        .first()
+    )
+
+    if not availability:
+        return {"available_slots": []}
+
+    # Work in whole minutes since the day's local midnight, so the slot loop
+    # is integer arithmetic rather than timezone-aware datetime math
+    day_start = timezone.make_aware(datetime.combine(date, time.min))
+    minute = timedelta(minutes=1)
+    duration = visit_type.duration_minutes
+
+    # Only bookings overlapping the availability window matter; the range test
+    # runs in SQL on the partial index of scheduled bookings, and that
+    # includes bookings carried over from the previous evening
+    bookings = (
+        Appointment.objects.filter(
+            doctor_id=doctor_id,
+            status="scheduled",
+            scheduled_time__lt=day_start + availability.end_minute * minute,
+            end_time__gt=day_start + availability.start_minute * minute,
+        )
+        .order_by()
+        .values_list("scheduled_time", "end_time")
+    )
+
+    # Bit m of busy is set when minute m of the day is booked, so checking a
+    # slot is a single AND against a mask of the visit's length
+    busy = 0
+    for scheduled_time, end_time in bookings:
+        booked_start = max((scheduled_time - day_start) // minute, 0)
+        booked_end = -((day_start - end_time) // minute)  # round partial up
+        if booked_end <= booked_start:
+            continue  # a malformed interval must not break the whole day
+        busy |= ((1 << (booked_end - booked_start)) - 1) << booked_start
+
+    available_slots = [
+        label
+        for label, slot_mask in _candidate_slots(
+            availability.start_minute, availability.end_minute, duration
+        )
+        if not busy & slot_mask
+    ]
+
+    return {
+        "doctor": str(doctor),
+        "clinic": clinic.name,
+        "visit_type": visit_type.name,
+        "date": date.isoformat(),
+        "available_slots": available_slots,
+    }
+
+
+@conditional_page
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@renderer_classes([ORJSONRenderer])
 def available_slots(request):
     """Get available appointment slots"""
     required = ["doctor_id", "clinic_id", "visit_type_id", "date"]
@@ -330,65 +554,20 @@ def available_slots(request):
 
     try:
         date = datetime.strptime(request.GET["date"], "%Y-%m-%d").date()
-        doctor = Doctor.objects.get(id=request.GET["doctor_id"])
-        clinic = Clinic.objects.get(id=request.GET["clinic_id"])
-        visit_type = VisitType.objects.get(id=request.GET["visit_type_id"])
-    except Exception as e:
+        doctor_id, clinic_id, visit_type_id = (
+            int(request.GET[param]) for param in required[:3]
+        )
+    except ValueError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check doctor availability
-    availability = DoctorClinicAvailability.objects.filter(
-        doctor=doctor, clinic=clinic, day_of_week=date.isoweekday()
-    ).first()
+    # Bookings and availability changes invalidate the doctor's entries
+    cache_key = slots_cache_key(doctor_id, clinic_id, visit_type_id, date)
+    data = cache.get(cache_key)
+    if data is None:
+        try:
+            data = build_available_slots(doctor_id, clinic_id, visit_type_id, date)
+        except ObjectDoesNotExist as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cache.set(cache_key, data, SLOTS_CACHE_TIMEOUT)
 
-    if not availability:
-        return Response({"available_slots": []})
-
-    # Get booked appointments with their durations
-    appointments = Appointment.objects.filter(
-        doctor=doctor, scheduled_time__date=date, status="scheduled"
-    ).select_related("visit_type")
-
-    slot_duration = timedelta(minutes=visit_type.duration_minutes)
-    available_slots = []
-
-    current_time = timezone.make_aware(datetime.combine(date, availability.start_time))
-    end_time = timezone.make_aware(datetime.combine(date, availability.end_time))
-
-    # Create a set of all busy times (at 15-minute intervals)
-    busy_times = set()
-    for appointment in appointments:
-        appt_start = appointment.scheduled_time
-        appt_duration = timedelta(minutes=appointment.visit_type.duration_minutes)
-        appt_end = appt_start + appt_duration
-
-        # Mark every 15-minute interval within this appointment as busy
-        time_slot = appt_start
-        while time_slot < appt_end:
-            busy_times.add(time_slot.time())
-            time_slot += timedelta(minutes=15)
-
-    while current_time + slot_duration <= end_time:
-        # Check if any 15-minute interval within this slot is busy
-        slot_available = True
-        check_time = current_time
-        while check_time < current_time + slot_duration:
-            if check_time.time() in busy_times:
-                slot_available = False
-                break
-            check_time += timedelta(minutes=15)
-
-        if slot_available:
-            available_slots.append(current_time.strftime("%H:%M"))
-
-        current_time += timedelta(minutes=15)
-
-    return Response(
-        {
-            "doctor": f"Dr. {doctor.user.get_full_name()}",
-            "clinic": clinic.name,
-            "visit_type": visit_type.name,
-            "date": request.GET["date"],
-            "available_slots": available_slots,
-        }
-    )
+    return Response(data)
@@ -67,12 +67,39 @@ DATABASES = {
     }
 }
 
+# Shared cache for available slots and authenticated tokens. Without Redis
+# each worker process falls back to its own local-memory cache
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+# Revoked tokens must leave every worker's cache, so only cache them in Redis
+CACHE_AUTH_TOKENS = bool(REDIS_URL)
+
+# Argon2 is cheaper per login than PBKDF2 at Django's iteration count;
+# existing PBKDF2 hashes are upgraded on the user's next login
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 # Override for testing
 if 'test' in sys.argv:
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
     }
+    # Tests never check hash strength, so skip PBKDF2's cost
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    # Test data is rolled back without signals, so never serve cached results
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
 
 AUTH_PASSWORD_VALIDATORS = [
     {